@@ -4,7 +4,7 @@ KeplerAI Backend API
 Flask server for exoplanet classification with ML inference.
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
@@ -12,10 +12,23 @@ import joblib
 import os
 import sqlite3
 from datetime import datetime
-import json
+import msgspec
+import orjson
+import atexit
+import functools
 import logging
+import queue
+import re
+import threading
+import time
 from werkzeug.utils import secure_filename
 import traceback
+from typing import Optional
+
+try:
+    from numba import njit
+except ImportError:  # Optional: run the post-processing kernel with plain NumPy
+    njit = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,8 +40,69 @@ CORS(app)
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'csv', 'json', 'fits'}
+CSV_CHUNK_SIZE = 10_000  # rows parsed and scored at a time from uploaded CSVs
 MODEL_DIR = 'models'
-DATABASE = 'kepler_ai.db'
+DATABASE = os.environ.get('DATABASE_PATH', 'kepler_ai.db')
+
+# Micro-batching for /api/predict
+MAX_BATCH = 64
+BATCH_TIMEOUT = 0.01  # seconds to wait for more requests to join a batch
+
+# Memoized predictions, keyed on inputs rounded to PREDICTION_CACHE_DIGITS decimals
+PREDICTION_CACHE_SIZE = 4096
+PREDICTION_CACHE_DIGITS = 4
+
+# Batched writes of the prediction log
+WRITE_BATCH_SIZE = 100
+WRITE_INTERVAL = 0.5  # seconds to wait for more predictions to join a write
+
+# Largest accepted feature magnitude; inf, NaN and anything past float32 range is rejected
+MAX_FEATURE_VALUE = float(np.finfo(np.float32).max)
+
+# Default values for optional params missing from a request
+OPTIONAL_FEATURE_DEFAULTS = {'koi_impact': 0.0, 'koi_score': 0.0, 'koi_slogg': 0.0}
+
+# Map frontend names to model feature names
+FEATURE_MAPPING = {
+    'orbital_period': 'koi_period',
+    'transit_duration': 'koi_duration',
+    'transit_depth': 'koi_depth',
+    'planetary_radius': 'koi_prad',
+    'equilibrium_temperature': 'koi_teq',
+    'insolation_flux': 'koi_insol',
+    'transit_signal_to_noise': 'koi_model_snr',
+    'stellar_effective_temperature': 'koi_steff',
+    'stellar_radius': 'koi_srad',
+    'impact_parameter': 'koi_impact',
+    'disposition_score': 'koi_score',
+    'stellar_surface_gravity': 'koi_slogg'
+}
+
+REQUIRED_FEATURES = (
+    'orbital_period', 'transit_duration', 'transit_depth',
+    'planetary_radius', 'equilibrium_temperature', 'insolation_flux',
+    'transit_signal_to_noise', 'stellar_effective_temperature', 'stellar_radius'
+)
+
+OPTIONAL_FEATURES = (
+    'impact_parameter', 'disposition_score', 'stellar_surface_gravity'
+)
+
+class PredictRequest(msgspec.Struct):
+    """Body of /api/predict, decoded and validated in a single pass"""
+    orbital_period: float
+    transit_duration: float
+    transit_depth: float
+    planetary_radius: float
+    equilibrium_temperature: float
+    insolation_flux: float
+    transit_signal_to_noise: float
+    stellar_effective_temperature: float
+    stellar_radius: float
+    impact_parameter: Optional[float] = None
+    disposition_score: Optional[float] = None
+    stellar_surface_gravity: Optional[float] = None
+    session_id: Optional[str] = 'anonymous'
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
@@ -36,32 +110,54 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(MODEL_DIR, exist_ok=True)
+os.makedirs(os.path.dirname(DATABASE) or '.', exist_ok=True)
 
 class ExoplanetPredictor:
     def __init__(self):
         self.model = None
-        self.scaler = None
         self.label_encoder = None
         self.feature_columns = None
+        self._predict_cached = functools.lru_cache(maxsize=PREDICTION_CACHE_SIZE)(self._predict_key)
         self.load_model()
+        self.start_worker()
     
     def load_model(self):
         """Load the trained model and preprocessing objects"""
         try:
             model_path = os.path.join(MODEL_DIR, 'exoplanet_classifier.pkl')
-            scaler_path = os.path.join(MODEL_DIR, 'feature_scaler.pkl')
             encoder_path = os.path.join(MODEL_DIR, 'label_encoder.pkl')
             features_path = os.path.join(MODEL_DIR, 'feature_names.txt')
             
-            if all(os.path.exists(path) for path in [model_path, scaler_path, encoder_path, features_path]):
-                self.model = joblib.load(model_path)
-                self.scaler = joblib.load(scaler_path)
+            if all(os.path.exists(path) for path in [model_path, encoder_path, features_path]):
+                self._predict_cached.cache_clear()
+                # Memory-map the model arrays so workers share them through the page cache
+                self.model = joblib.load(model_path, mmap_mode='r')
                 self.label_encoder = joblib.load(encoder_path)
                 
                 # Load feature names
                 with open(features_path, 'r') as f:
                     self.feature_columns = [line.strip() for line in f.readlines()]
                 
+                # Column positions and the default row, computed once per load
+                self._col_index = {col: i for i, col in enumerate(self.feature_columns)}
+                self._required_columns = [col for col in self.feature_columns if col not in OPTIONAL_FEATURE_DEFAULTS]
+                self._required_idx = [self._col_index[col] for col in self._required_columns]
+                self._default_row = np.zeros(len(self.feature_columns), dtype=np.float64)
+                for col, value in OPTIONAL_FEATURE_DEFAULTS.items():
+                    if col in self._col_index:
+                        self._default_row[self._col_index[col]] = value
+                self._defaults = self._default_row.tolist()
+                
+                # Class positions for merging CONFIRMED and CANDIDATE scores
+                classes = list(self.label_encoder.classes_)
+                self._cc_idx = np.array([i for i, c in enumerate(classes) if c in ('CONFIRMED', 'CANDIDATE')], dtype=np.intp)
+                self._fp_idx = np.array([i for i, c in enumerate(classes) if c == 'FALSE POSITIVE'], dtype=np.intp)
+                self._other_idx = np.array([i for i, c in enumerate(classes) if c not in ('CONFIRMED', 'CANDIDATE')], dtype=np.intp)
+                self._other_classes = [classes[i] for i in self._other_idx]
+                
+                # Batch buffer owned by the worker thread, in the float64 the model was trained on
+                self._batch_buf = np.empty((MAX_BATCH, len(self.feature_columns)), dtype=np.float64)
+                
                 logger.info("Model loaded successfully!")
             else:
                 logger.warning("Model files not found. Please train the model first.")
@@ -69,80 +165,166 @@ class ExoplanetPredictor:
         except Exception as e:
             logger.error(f"Error loading model: {str(e)}")
     
+    def start_worker(self):
+        """Start the background thread that batches pending predictions"""
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._batch_worker, name='predict-batcher', daemon=True)
+        self._worker.start()
+    
     def predict(self, features):
-        """Make prediction on input features"""
+        """Make prediction on input features
+        
+        Inputs are rounded to PREDICTION_CACHE_DIGITS decimals and repeated
+        inputs are served from an LRU cache. Cache misses are queued and scored
+        together with any other requests that arrive within BATCH_TIMEOUT, so
+        the model runs once per batch.
+        """
         if self.model is None:
             raise ValueError("Model not loaded. Please train the model first.")
         
-        try:
-            # Convert to DataFrame if dict
-            if isinstance(features, dict):
-                features_df = pd.DataFrame([features])
-            else:
-                features_df = features.copy()
-            
-            # Ensure all required columns are present
-            for col in self.feature_columns:
-                if col not in features_df.columns:
-                    # Fill missing optional parameters with median values
-                    if col in ['koi_impact', 'koi_score', 'koi_slogg']:
-                        features_df[col] = 0.0  # Default value for optional params
-                    else:
-                        raise ValueError(f"Required feature '{col}' is missing")
-            
-            # Select only the required features in correct order
-            features_selected = features_df[self.feature_columns]
-            
-            # Scale features
-            features_scaled = self.scaler.transform(features_selected)
-            
-            # Make prediction
-            prediction = self.model.predict(features_scaled)
-            probabilities = self.model.predict_proba(features_scaled)
-            
-            # Convert back to original labels
-            predicted_label = self.label_encoder.inverse_transform(prediction)[0]
-            
-            # Get confidence scores
-            confidence_scores = {}
-            for i, class_name in enumerate(self.label_encoder.classes_):
-                confidence_scores[class_name] = float(probabilities[0][i])
-            
-            # Merge CONFIRMED and CANDIDATE categories
-            merged_confidence_scores = {}
-            confirmed_candidate_score = 0.0
-            
-            for class_name, score in confidence_scores.items():
-                if class_name in ['CONFIRMED', 'CANDIDATE']:
-                    confirmed_candidate_score += score
-                else:
-                    merged_confidence_scores[class_name] = score
-            
-            # Add merged category
-            merged_confidence_scores['CONFIRMED/CANDIDATE'] = confirmed_candidate_score
-            
-            # Determine final prediction based on CONFIRMED/CANDIDATE vs FALSE POSITIVE comparison
-            false_positive_score = merged_confidence_scores.get('FALSE POSITIVE', 0.0)
-            
-            if confirmed_candidate_score > false_positive_score:
-                final_prediction = 'CONFIRMED/CANDIDATE'
-                max_confidence = confirmed_candidate_score
-            else:
-                final_prediction = 'FALSE POSITIVE'
-                max_confidence = false_positive_score
-            
-            confidence_scores = merged_confidence_scores
+        # Ensure all required columns are present; optional ones fall back to defaults
+        for col in self._required_columns:
+            if col not in features:
+                raise ValueError(f"Required feature '{col}' is missing")
+        
+        key = tuple(
+            round(features[col], PREDICTION_CACHE_DIGITS) if col in features else default
+            for col, default in zip(self.feature_columns, self._defaults)
+        )
+        
+        # A bad value would fail the model call for every request batched with this one
+        for col, value in zip(self.feature_columns, key):
+            if not abs(value) <= MAX_FEATURE_VALUE:
+                raise ValueError(f"Feature '{col}' must be a finite number")
+        
+        return self._predict_cached(key)
+    
+    def _predict_key(self, key):
+        """Score one row of feature values (in feature_columns order) via the batch worker"""
+        done = threading.Event()
+        result_slot = {}
+        self._queue.put((key, done, result_slot))
+        done.wait()
+        
+        if 'error' in result_slot:
+            raise result_slot['error']
+        return result_slot['result']
+    
+    def predict_many(self, features_df):
+        """Make predictions for every row of a DataFrame with one model call
+        
+        Each result carries its DataFrame index as 'row'. Rows with a missing
+        required value or a non-finite value get an 'error' instead of a
+        prediction; the remaining rows are still scored.
+        """
+        if self.model is None:
+            raise ValueError("Model not loaded. Please train the model first.")
+        
+        for col in self._required_columns:
+            if col not in features_df.columns:
+                raise ValueError(f"Required feature '{col}' is missing")
+        
+        # Non-numeric cells become NaN and are reported like missing values
+        features = features_df.reindex(columns=self.feature_columns)
+        features = features.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+        
+        # Missing optional values fall back to defaults
+        missing = np.isnan(features)
+        features = np.where(missing, self._default_row, features)
+        
+        # A bad value would fail the model call for the whole frame, so flag it per row
+        missing_required = missing[:, self._required_idx]
+        invalid = ~(np.abs(features) <= MAX_FEATURE_VALUE)
+        errors = {}
+        for i in np.flatnonzero(invalid.any(axis=1)):
+            errors[i] = f"Feature '{self.feature_columns[invalid[i].argmax()]}' must be a finite number"
+        for i in np.flatnonzero(missing_required.any(axis=1)):
+            errors[i] = f"Required feature '{self._required_columns[missing_required[i].argmax()]}' is missing"
+        
+        valid = np.ones(len(features), dtype=bool)
+        valid[list(errors)] = False
+        scored = iter(self._format_results(self.model.predict_proba(features[valid])) if valid.any() else [])
+        
+        results = []
+        for i, row in enumerate(features_df.index):
+            result = {'error': errors[i]} if i in errors else next(scored)
+            results.append({'row': int(row), **result})
+        return results
+    
+    def _batch_worker(self):
+        """Drain up to MAX_BATCH queued requests and score them in one call"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_TIMEOUT
+            while len(batch) < MAX_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
             
-            return {
-                'prediction': final_prediction,
+            try:
+                results = self._predict_batch([row for row, _, _ in batch])
+                for (_, _, result_slot), result in zip(batch, results):
+                    result_slot['result'] = result
+            except Exception as e:
+                logger.error(f"Prediction error: {str(e)}")
+                for _, _, result_slot in batch:
+                    result_slot['error'] = e
+            finally:
+                for _, done, _ in batch:
+                    done.set()
+    
+    def _predict_batch(self, rows):
+        """Score a list of feature rows with a single model call"""
+        n = len(rows)
+        features_batch = self._batch_buf[:n]
+        features_batch[:] = rows
+        
+        # Make prediction; the merged scores only need the class probabilities
+        probabilities = self.model.predict_proba(features_batch)
+        
+        results = self._format_results(probabilities)
+        for result in results:
+            result['features_used'] = self.feature_columns
+        return results
+    
+    def _format_results(self, probabilities):
+        """Build the response payloads for a matrix of class probabilities"""
+        is_confirmed_candidate, max_confidence, confirmed_candidate = merge_class_scores(
+            probabilities, self._cc_idx, self._fp_idx
+        )
+        other_scores = probabilities[:, self._other_idx].tolist()
+        
+        results = []
+        for scores, cc_score, cc_wins, confidence in zip(
+            other_scores, confirmed_candidate.tolist(), is_confirmed_candidate.tolist(), max_confidence.tolist()
+        ):
+            confidence_scores = dict(zip(self._other_classes, scores))
+            confidence_scores['CONFIRMED/CANDIDATE'] = cc_score
+            results.append({
+                'prediction': 'CONFIRMED/CANDIDATE' if cc_wins else 'FALSE POSITIVE',
                 'confidence_scores': confidence_scores,
-                'max_confidence': float(max_confidence),
-                'features_used': self.feature_columns
-            }
-            
-        except Exception as e:
-            logger.error(f"Prediction error: {str(e)}")
-            raise
+                'max_confidence': confidence
+            })
+        return results
+
+def merge_class_scores(probabilities, cc_idx, fp_idx):
+    """Merge CONFIRMED and CANDIDATE scores and pick the final label of each row
+    
+    Returns (is_confirmed_candidate, max_confidence, confirmed_candidate_score),
+    where a row is CONFIRMED/CANDIDATE when its merged score beats FALSE POSITIVE.
+    """
+    confirmed_candidate = probabilities[:, cc_idx].sum(axis=1)
+    false_positive = probabilities[:, fp_idx].sum(axis=1)
+    is_confirmed_candidate = confirmed_candidate > false_positive
+    max_confidence = np.where(is_confirmed_candidate, confirmed_candidate, false_positive)
+    return is_confirmed_candidate, max_confidence, confirmed_candidate
+
+if njit is not None:
+    merge_class_scores = njit(cache=True)(merge_class_scores)
 
 # Initialize predictor
 predictor = ExoplanetPredictor()
@@ -164,9 +346,97 @@ def init_database():
         )
     ''')
     
+    # History is read per session, newest first
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pred_session_ts
+        ON predictions(user_session, timestamp DESC)
+    ''')
+    
     conn.commit()
+    cursor.execute('PRAGMA optimize')
     conn.close()
 
+# Process-wide SQLite connection, shared by the writer thread and request handlers
+_db_conn = None
+_db_lock = threading.Lock()
+_pending_predictions = None
+_writer_thread = None
+
+def get_db():
+    """Return the shared SQLite connection, opening it on first use.
+    
+    Callers must hold _db_lock while using the connection.
+    """
+    global _db_conn
+    if _db_conn is None:
+        _db_conn = sqlite3.connect(DATABASE, check_same_thread=False)
+        # WAL lets readers run alongside the writer; NORMAL skips the fsync per commit
+        _db_conn.execute("PRAGMA journal_mode=WAL")
+        _db_conn.execute("PRAGMA synchronous=NORMAL")
+    return _db_conn
+
+def start_prediction_writer():
+    """Start the background thread that writes queued predictions to the database"""
+    global _pending_predictions, _writer_thread
+    _pending_predictions = queue.Queue()
+    _writer_thread = threading.Thread(target=_prediction_writer, args=(_pending_predictions,),
+                                      name='prediction-writer', daemon=True)
+    _writer_thread.start()
+
+def stop_prediction_writer(timeout=5.0):
+    """Flush queued predictions to the database, stop the writer and close the connection"""
+    global _db_conn
+    if _writer_thread is not None and _writer_thread.is_alive():
+        _pending_predictions.put(None)  # Sentinel: write what is queued, then exit
+        _writer_thread.join(timeout)
+    
+    try:
+        with _db_lock:
+            if _db_conn is not None:
+                # Fold the WAL back into the main file so it is complete on its own
+                _db_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                _db_conn.close()
+                _db_conn = None
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+
+def _prediction_writer(pending):
+    """Insert queued predictions every WRITE_BATCH_SIZE rows or WRITE_INTERVAL"""
+    stopping = False
+    while not stopping:
+        item = pending.get()
+        if item is None:
+            break
+        batch = [item]
+        deadline = time.monotonic() + WRITE_INTERVAL
+        while len(batch) < WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+        
+        try:
+            with _db_lock:
+                conn = get_db()
+                conn.executemany('''
+                    INSERT INTO predictions (input_features, prediction, confidence_scores, max_confidence, user_session)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', batch)
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Database error: {str(e)}")
+
+# Start the prediction writer and drain it on interpreter shutdown
+start_prediction_writer()
+atexit.register(stop_prediction_writer)
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -185,62 +455,39 @@ def home():
 def predict_exoplanet():
     """Predict exoplanet classification from input features"""
     try:
-        data = request.get_json()
+        body = request.get_data()
         
-        if not data:
+        if not body:
             return jsonify({'error': 'No input data provided'}), 400
         
+        # Decode, check required features and coerce numeric strings in one pass
+        try:
+            data = msgspec.json.decode(body, type=PredictRequest, strict=False)
+        except msgspec.DecodeError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Extract features
         features = {}
-        required_features = [
-            'orbital_period', 'transit_duration', 'transit_depth',
-            'planetary_radius', 'equilibrium_temperature', 'insolation_flux',
-            'transit_signal_to_noise', 'stellar_effective_temperature', 'stellar_radius'
-        ]
-        
-        optional_features = [
-            'impact_parameter', 'disposition_score', 'stellar_surface_gravity'
-        ]
-        
-        # Map frontend names to model feature names
-        feature_mapping = {
-            'orbital_period': 'koi_period',
-            'transit_duration': 'koi_duration',
-            'transit_depth': 'koi_depth',
-            'planetary_radius': 'koi_prad',
-            'equilibrium_temperature': 'koi_teq',
-            'insolation_flux': 'koi_insol',
-            'transit_signal_to_noise': 'koi_model_snr',
-            'stellar_effective_temperature': 'koi_steff',
-            'stellar_radius': 'koi_srad',
-            'impact_parameter': 'koi_impact',
-            'disposition_score': 'koi_score',
-            'stellar_surface_gravity': 'koi_slogg'
-        }
-        
-        # Check required features
-        for feature in required_features:
-            if feature not in data:
-                return jsonify({'error': f'Required feature "{feature}" is missing'}), 400
-            features[feature_mapping[feature]] = float(data[feature])
+        for feature in REQUIRED_FEATURES:
+            features[FEATURE_MAPPING[feature]] = getattr(data, feature)
         
         # Add optional features
-        for feature in optional_features:
-            if feature in data and data[feature] is not None:
-                features[feature_mapping[feature]] = float(data[feature])
+        for feature in OPTIONAL_FEATURES:
+            value = getattr(data, feature)
+            if value is not None:
+                features[FEATURE_MAPPING[feature]] = value
         
         # Make prediction
         result = predictor.predict(features)
         
         # Store prediction in database
-        user_session = data.get('session_id', 'anonymous')
-        store_prediction(features, result, user_session)
+        store_prediction(features, result, data.session_id)
         
-        return jsonify({
+        return Response(orjson.dumps({
             'success': True,
             'result': result,
             'timestamp': datetime.now().isoformat()
-        })
+        }), mimetype='application/json')
         
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
@@ -249,6 +496,107 @@ def predict_exoplanet():
         logger.error(traceback.format_exc())
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/predict_batch', methods=['POST'])
+def predict_batch():
+    """Predict exoplanet classifications for many samples in one model call"""
+    try:
+        if 'file' in request.files:
+            file = request.files['file']
+            if not file.filename.lower().endswith('.csv'):
+                return jsonify({'error': 'Batch prediction requires a CSV file'}), 400
+            
+            # Parse only the feature columns, CSV_CHUNK_SIZE rows at a time; bad cells are
+            # coerced and reported per row by predict_many instead of failing the chunk
+            feature_names = set(predictor.feature_columns or []) | set(FEATURE_MAPPING)
+            chunks = pd.read_csv(file, comment='#', chunksize=CSV_CHUNK_SIZE,
+                                 usecols=lambda col: col in feature_names)
+            return stream_batch_predictions(chunks)
+        else:
+            data = request.get_json(silent=True)
+            records = data.get('samples') if isinstance(data, dict) else data
+            if not records:
+                return jsonify({'error': 'No input data provided'}), 400
+            features_df = pd.DataFrame(records)
+        
+        results = predictor.predict_many(to_model_columns(features_df))
+        
+        return Response(orjson.dumps({
+            'success': True,
+            'results': results,
+            'count': len(results),
+            'failed': sum('error' in result for result in results),
+            'features_used': predictor.feature_columns,
+            'timestamp': datetime.now().isoformat()
+        }), mimetype='application/json')
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': 'Internal server error'}), 500
+
+def to_model_columns(features_df):
+    """Rename frontend columns to model feature names
+    
+    A feature given under both names, in one record or across records,
+    becomes a single column holding the first non-null value of each row.
+    """
+    features_df = features_df.rename(columns=FEATURE_MAPPING)
+    if features_df.columns.has_duplicates:
+        features_df = features_df.T.groupby(level=0, sort=False).first().T
+    return features_df
+
+def stream_batch_predictions(chunks):
+    """Stream predictions for an iterator of feature DataFrames as one JSON document"""
+    try:
+        # Score the first chunk before responding so bad input still gets a 400
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            raise ValueError('No input data provided')
+        first_results = predictor.predict_many(to_model_columns(first_chunk))
+    except Exception:
+        chunks.close()
+        raise
+    
+    def generate():
+        results = first_results
+        count = 0
+        failed = 0
+        error = None
+        try:
+            yield b'{"results": ['
+            while True:
+                if results:
+                    yield (b',' if count else b'') + orjson.dumps(results)[1:-1]
+                    count += len(results)
+                    failed += sum('error' in result for result in results)
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                results = predictor.predict_many(to_model_columns(chunk))
+        except ValueError as e:
+            error = str(e)
+        except Exception as e:
+            logger.error(f"Batch prediction error: {str(e)}")
+            logger.error(traceback.format_exc())
+            error = 'Internal server error'
+        finally:
+            chunks.close()
+        
+        summary = {
+            'success': error is None,
+            'count': count,
+            'failed': failed,
+            'features_used': predictor.feature_columns,
+            'timestamp': datetime.now().isoformat()
+        }
+        if error is not None:
+            summary['error'] = error
+        yield b'],' + orjson.dumps(summary)[1:]
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """Upload and process data files"""
@@ -269,11 +617,13 @@ def upload_file():
             file_ext = filename.rsplit('.', 1)[1].lower()
             
             if file_ext == 'csv':
-                df = pd.read_csv(filepath)
-                data = df.to_dict('records')
+                # Only the first chunk is parsed; the preview needs a handful of rows
+                with pd.read_csv(filepath, chunksize=CSV_CHUNK_SIZE) as reader:
+                    first_chunk = next(reader, None)
+                data = first_chunk.head(5).to_dict('records') if first_chunk is not None else []
             elif file_ext == 'json':
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
+                with open(filepath, 'rb') as f:
+                    data = orjson.loads(f.read())
             elif file_ext == 'fits':
                 # Basic FITS file handling (requires astropy)
                 try:
@@ -303,28 +653,24 @@ def get_prediction_history():
         session_id = request.args.get('session_id', 'anonymous')
         limit = int(request.args.get('limit', 50))
         
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, timestamp, input_features, prediction, confidence_scores, max_confidence
-            FROM predictions 
-            WHERE user_session = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (session_id, limit))
-        
-        rows = cursor.fetchall()
-        conn.close()
+        with _db_lock:
+            cursor = get_db().execute('''
+                SELECT id, timestamp, input_features, prediction, confidence_scores, max_confidence
+                FROM predictions 
+                WHERE user_session = ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            ''', (session_id, limit))
+            rows = cursor.fetchall()
         
         history = []
         for row in rows:
             history.append({
                 'id': row[0],
                 'timestamp': row[1],
-                'input_features': json.loads(row[2]),
+                'input_features': orjson.loads(row[2]),
                 'prediction': row[3],
-                'confidence_scores': json.loads(row[4]),
+                'confidence_scores': orjson.loads(row[4]),
                 'max_confidence': row[5]
             })
         
@@ -346,7 +692,7 @@ def get_model_info():
             return jsonify({'error': 'Model not loaded'}), 500
         
         info = {
-            'model_type': 'Random Forest Classifier',
+            'model_type': re.sub(r'(?<!^)(?=[A-Z])', ' ', type(predictor.model).__name__),
             'features': predictor.feature_columns,
             'classes': predictor.label_encoder.classes_.tolist() if predictor.label_encoder else [],
             'model_loaded': True,
@@ -363,25 +709,16 @@ def get_model_info():
         return jsonify({'error': 'Failed to get model info'}), 500
 
 def store_prediction(features, result, user_session):
-    """Store prediction in database"""
+    """Queue prediction for the database writer thread"""
     try:
-        conn = sqlite3.connect(DATABASE)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO predictions (input_features, prediction, confidence_scores, max_confidence, user_session)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            json.dumps(features),
+        _pending_predictions.put((
+            orjson.dumps(features).decode(),
             result['prediction'],
-            json.dumps(result['confidence_scores']),
+            orjson.dumps(result['confidence_scores']).decode(),
             result['max_confidence'],
             user_session
         ))
         
-        conn.commit()
-        conn.close()
-        
     except Exception as e:
         logger.error(f"Database error: {str(e)}")
 
@@ -398,6 +735,8 @@ def internal_error(e):
     return jsonify({'error': 'Internal server error'}), 500
 
 if __name__ == '__main__':
+    # Local development server; production runs under gunicorn (see gunicorn.conf.py)
+    
     # Initialize database
     init_database()
     
@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration for the KeplerAI backend.
+Picked up automatically when running `gunicorn app:app` from this directory.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = os.cpu_count() or 1
+worker_class = 'gthread'
+threads = 4
+timeout = 120
+
+# Load the model once in the master so forked workers share it copy-on-write
+preload_app = True
+
+def on_starting(server):
+    """Create the database schema once, before any worker is forked"""
+    from app import init_database
+    init_database()
+
+def post_fork(server, worker):
+    """Restart the background threads, which don't survive the fork"""
+    from app import predictor, start_prediction_writer
+    predictor.start_worker()
+    start_prediction_writer()
+
+def worker_exit(server, worker):
+    """Flush queued prediction history before the worker goes away"""
+    from app import stop_prediction_writer
+    stop_prediction_writer()
@@ -1,18 +1,17 @@
 #!/usr/bin/env python3
 """
 KeplerAI - Exoplanet Classification Model Training
-Trains a Random Forest classifier on the KOI dataset to predict exoplanet disposition.
+Trains a histogram gradient boosting classifier on the KOI dataset to predict exoplanet disposition.
 """
 
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.inspection import permutation_importance
 from sklearn.model_selection import train_test_split, GridSearchCV, cross_val_score
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import warnings
 warnings.filterwarnings('ignore')
@@ -20,7 +19,6 @@ warnings.filterwarnings('ignore')
 class ExoplanetClassifier:
     def __init__(self):
         self.model = None
-        self.scaler = StandardScaler()
         self.label_encoder = LabelEncoder()
         self.feature_columns = [
             'koi_period',        # Orbital Period
@@ -72,14 +70,14 @@ class ExoplanetClassifier:
         
         # Remove outliers using IQR method
         print("Removing outliers...")
-        for col in self.feature_columns:
-            if col in df.columns:
-                Q1 = df[col].quantile(0.25)
-                Q3 = df[col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                df = df[(df[col] >= lower_bound) & (df[col] <= upper_bound)]
+        # Bounds for all features in one pass, then a single row mask
+        quartiles = df[self.feature_columns].quantile([0.25, 0.75])
+        IQR = quartiles.loc[0.75] - quartiles.loc[0.25]
+        lower_bound = (quartiles.loc[0.25] - 1.5 * IQR).values
+        upper_bound = (quartiles.loc[0.75] + 1.5 * IQR).values
+        values = df[self.feature_columns].values
+        mask = ((values >= lower_bound) & (values <= upper_bound)).all(axis=1)
+        df = df.loc[mask]
         
         print(f"After outlier removal: {len(df)} records")
         
@@ -90,7 +88,7 @@ class ExoplanetClassifier:
         return df
     
     def train_model(self, df):
-        """Train the Random Forest classifier"""
+        """Train the gradient boosting classifier"""
         print("\nPreparing features and targets...")
         
         # Prepare features and target
@@ -105,33 +103,31 @@ class ExoplanetClassifier:
             X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded
         )
         
-        # Scale features
-        X_train_scaled = self.scaler.fit_transform(X_train)
-        X_test_scaled = self.scaler.transform(X_test)
-        
-        print("Training Random Forest classifier...")
-        
-        # Use optimized Random Forest parameters (pre-tuned for speed)
-        self.model = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=10,
-            min_samples_split=5,
-            min_samples_leaf=1,
-            max_features='sqrt',
-            random_state=42,
-            n_jobs=1  # Use single thread to avoid multiprocessing issues
+        # Histogram boosting validates input as float64, so convert once here
+        X_train = X_train.to_numpy(dtype=np.float64)
+        X_test = X_test.to_numpy(dtype=np.float64)
+        
+        print("Training Histogram Gradient Boosting classifier...")
+        
+        # Binned boosting: more accurate than the old forest and much cheaper to predict
+        self.model = HistGradientBoostingClassifier(
+            max_iter=200,
+            max_depth=8,
+            learning_rate=0.05,
+            early_stopping=True,
+            random_state=42
         )
         
-        self.model.fit(X_train_scaled, y_train)
+        self.model.fit(X_train, y_train)
         print("Model training completed!")
         
         # Evaluate model
-        y_pred = self.model.predict(X_test_scaled)
+        y_pred = self.model.predict(X_test)
         accuracy = accuracy_score(y_test, y_pred)
         print(f"\nModel Accuracy: {accuracy:.4f}")
         
         # Cross-validation score
-        cv_scores = cross_val_score(self.model, X_train_scaled, y_train, cv=5)
+        cv_scores = cross_val_score(self.model, X_train, y_train, cv=5, n_jobs=-1)
         print(f"Cross-validation score: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
         
         # Classification report
@@ -140,19 +136,26 @@ class ExoplanetClassifier:
         print(classification_report(y_test, y_pred, target_names=target_names))
         
         # Feature importance
-        self.plot_feature_importance()
+        self.plot_feature_importance(X_test, y_test)
         
         # Confusion matrix
         self.plot_confusion_matrix(y_test, y_pred, target_names)
         
         return accuracy
     
-    def plot_feature_importance(self):
-        """Plot feature importance"""
+    def plot_feature_importance(self, X, y):
+        """Plot permutation feature importance on held-out data"""
         if self.model is None:
             return
         
-        importance = self.model.feature_importances_
+        # Imported here so training without plots doesn't pay for matplotlib
+        import matplotlib
+        matplotlib.use('Agg')  # Render to files only, no GUI backend
+        import matplotlib.pyplot as plt
+        
+        importance = permutation_importance(
+            self.model, X, y, n_repeats=10, random_state=42, n_jobs=-1
+        ).importances_mean
         feature_names = [name.replace('koi_', '') for name in self.feature_columns]
         
         plt.figure(figsize=(10, 8))
@@ -167,6 +170,11 @@ class ExoplanetClassifier:
         
     def plot_confusion_matrix(self, y_true, y_pred, target_names):
         """Plot confusion matrix"""
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         cm = confusion_matrix(y_true, y_pred)
         
         plt.figure(figsize=(8, 6))
@@ -183,17 +191,37 @@ class ExoplanetClassifier:
         """Save the trained model and preprocessing objects"""
         os.makedirs(model_dir, exist_ok=True)
         
-        joblib.dump(self.model, os.path.join(model_dir, 'exoplanet_classifier.pkl'))
-        joblib.dump(self.scaler, os.path.join(model_dir, 'feature_scaler.pkl'))
-        joblib.dump(self.label_encoder, os.path.join(model_dir, 'label_encoder.pkl'))
+        # Uncompressed so the API can memory-map the model arrays
+        self._replace_file(os.path.join(model_dir, 'exoplanet_classifier.pkl'),
+                           lambda path: joblib.dump(self.model, path, compress=0))
+        self._replace_file(os.path.join(model_dir, 'label_encoder.pkl'),
+                           lambda path: joblib.dump(self.label_encoder, path))
         
         # Save feature names
-        with open(os.path.join(model_dir, 'feature_names.txt'), 'w') as f:
-            for feature in self.feature_columns:
-                f.write(f"{feature}\n")
+        def write_feature_names(path):
+            with open(path, 'w') as f:
+                for feature in self.feature_columns:
+                    f.write(f"{feature}\n")
+        self._replace_file(os.path.join(model_dir, 'feature_names.txt'), write_feature_names)
         
         print(f"Model saved to {model_dir}")
     
+    @staticmethod
+    def _replace_file(path, write):
+        """Write a file next to path with write(tmp_path), then move it into place
+        
+        A running API memory-maps the model pickle. os.replace gives the new
+        file its own inode, so those mappings keep the old file instead of
+        being truncated under the workers (which kills them with SIGBUS).
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
     def predict(self, features):
         """Make predictions on new data"""
         if self.model is None:
@@ -203,12 +231,9 @@ class ExoplanetClassifier:
         if isinstance(features, dict):
             features = pd.DataFrame([features])
         
-        # Scale features
-        features_scaled = self.scaler.transform(features[self.feature_columns])
-        
-        # Make prediction
-        prediction = self.model.predict(features_scaled)
-        probabilities = self.model.predict_proba(features_scaled)
+        # Make prediction (argmax of the probabilities, same as model.predict)
+        probabilities = self.model.predict_proba(features[self.feature_columns].to_numpy(dtype=np.float64))
+        prediction = probabilities.argmax(axis=1)
         
         # Convert back to original labels
         predicted_label = self.label_encoder.inverse_transform(prediction)[0]